@@ -0,0 +1,10 @@
+"""Minimal entry point for background workers: runs `run_worker(watch=True)` without importing typer/rich."""
+
+from __future__ import annotations
+
+import sys
+
+from nbqueue.worker import run_worker
+
+if __name__ == "__main__":
+    sys.exit(run_worker(watch=True))
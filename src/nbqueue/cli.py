@@ -1,37 +1,50 @@
 from __future__ import annotations
 
-import json
 import os
 import subprocess
 import sys
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 
 import typer
-from rich.console import Console
-from rich.table import Table
 
 from . import __version__
-from .ps import kill_with_grace
+from .ps import kill_with_grace, notify_worker_stop
 from .state import (
     QueueItem,
     Session,
     active_session,
-    append_queue,
+    append_queue_many,
+    clear_sessions_cache,
     get_or_create_session,
-    latest_session,
     load_state,
     read_lock_pid,
+    reporting_session,
     save_state,
 )
 from .state import (
     clear_queue as clear_queue_state,
 )
-from .utils import elapsed_since, snapshot_source_to
-from .worker import run_worker
+from .utils import base_dir, elapsed_since, json_dumps, snapshot_source_to
+
+if TYPE_CHECKING:
+    from rich.console import Console
 
 app = typer.Typer(no_args_is_help=True)
-console = Console()
+console: Optional["Console"] = None
+
+
+def _console() -> "Console":
+    """
+    Create the Rich console on first use so JSON/no-op paths never import Rich.
+    """
+    global console
+    if console is None:
+        from rich.console import Console
+
+        console = Console()
+    return console
 
 # ASCII banner for nbqueue (barbequeue pun)
 NBQ_BANNER = r"""
@@ -52,24 +65,24 @@ NBQ_BANNER = r"""
 
 def _print_banner(with_version: bool = True) -> None:
     try:
-        console.print(NBQ_BANNER, style="bold red")
+        _console().print(NBQ_BANNER, style="bold red")
         if with_version:
-            console.print(f"nbq v{__version__}", style="bold yellow")
+            _console().print(f"nbq v{__version__}", style="bold yellow")
     except (OSError, RuntimeError):
         pass
 
 
 def _session_for_reporting() -> Optional[Session]:
-    return active_session() or latest_session()
+    return reporting_session()
 
 def _ensure_worker_running() -> None:
     sess = active_session()
     if sess:
         return
-    # Launch background worker: nbq run --watch
+    # Launch background worker (equivalent to nbq run --watch) via a CLI-free bootstrap
     try:
         subprocess.Popen(
-            [sys.executable, "-m", "nbqueue.cli", "run", "--watch"],
+            [sys.executable, "-m", "nbqueue._worker_entry"],
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
             start_new_session=True,
@@ -89,20 +102,20 @@ def cmd_add(
     .ipynb are cleared of outputs before snapshot; .py are copied as-is.
     """
     session = get_or_create_session()
-    added = 0
+    items: List[QueueItem] = []
     for p in paths:
         p = p.expanduser()
         if not p.exists():
-            console.print(f"[yellow]Skipping missing path:[/yellow] {p}")
+            _console().print(f"[yellow]Skipping missing path:[/yellow] {p}")
             continue
         snap = snapshot_source_to(session.queue_dir, p, tag)
-        item = QueueItem.make(original_path=p, queue_path=snap, tag=tag)
-        append_queue(session, item)
-        added += 1
-        console.print(f"[green]Enqueued[/green] {p.name} -> {snap.name}")
+        items.append(QueueItem.make(original_path=p, queue_path=snap, tag=tag))
+        _console().print(f"[green]Enqueued[/green] {p.name} -> {snap.name}")
+    if items:
+        append_queue_many(session, items)
     if start:
         _ensure_worker_running()
-    if added == 0:
+    if not items:
         raise typer.Exit(code=1)
 
 @app.command("status")
@@ -112,17 +125,25 @@ def cmd_status(json_out: bool = typer.Option(False, "--json", help="Output machi
     """
     sess = _session_for_reporting()
     if not sess:
-        console.print("[dim]No sessions found.[/dim]")
+        _console().print("[dim]No sessions found.[/dim]")
         raise typer.Exit(code=0)
 
     st = load_state(sess)
     worker_pid = read_lock_pid(sess)
     if json_out:
-        console.print_json(
-            json.dumps({"version": __version__, "session": str(sess.root), "worker_pid": worker_pid, **st.to_dict()})
-        )
+        # Machine-readable: serialize once and bypass Rich formatting
+        payload = {
+            "version": __version__,
+            "session": str(sess.root),
+            "worker_pid": worker_pid,
+            **st.to_dict(),
+            "history": st.history,
+        }
+        sys.stdout.write(json_dumps(payload, indent=True).decode("utf-8"))
         return
 
+    from rich.table import Table
+
     # Pretty banner for human-readable status
     _print_banner(with_version=True)
 
@@ -135,24 +156,27 @@ def cmd_status(json_out: bool = typer.Option(False, "--json", help="Output machi
     table.add_column("Elapsed", no_wrap=True)
     table.add_column("Result", no_wrap=True)
 
+    # One clock reading for every row; basename avoids building a Path per row
+    now = datetime.now(timezone.utc)
+
     # Current running
     if st.current:
         cur = st.current
-        nb_name = Path(cur.get("queue_path", "")).name or "-"
-        elapsed = elapsed_since(cur.get("started_at") or cur.get("added_at") or "")
+        nb_name = os.path.basename(cur.get("queue_path", "")) or "-"
+        elapsed = elapsed_since(cur.get("started_at") or cur.get("added_at") or "", now=now)
         result = ""
         table.add_row(cur.get("id", "-"), nb_name, str(cur.get("tag") or ""), cur.get("status", "-"), elapsed, result)
 
     # Queued items
     for qi in st.queue:
-        nb_name = Path(qi.get("queue_path", "")).name or "-"
-        elapsed = elapsed_since(qi.get("added_at") or "")
+        nb_name = os.path.basename(qi.get("queue_path", "")) or "-"
+        elapsed = elapsed_since(qi.get("added_at") or "", now=now)
         table.add_row(qi.get("id", "-"), nb_name, str(qi.get("tag") or ""), qi.get("status", "queued"), elapsed, "")
 
     # If nothing to show
     if not st.current and not st.queue:
         table.add_row("-", "-", "-", "-", "-", "-")
-    console.print(table)
+    _console().print(table)
 
 @app.command("run")
 def cmd_run(
@@ -168,8 +192,10 @@ def cmd_run(
     if sess_running:
         pid = read_lock_pid(sess_running)
         if pid:
-            console.print(f"[yellow]A worker is already running (pid {pid}). No action taken.[/yellow]")
+            _console().print(f"[yellow]A worker is already running (pid {pid}). No action taken.[/yellow]")
             raise typer.Exit(code=0)
+    from .worker import run_worker
+
     code = run_worker(timeout=timeout, watch=watch, once=once)
     raise typer.Exit(code=code)
 
@@ -179,14 +205,14 @@ def cmd_clear(yes: bool = typer.Option(..., "--yes", help="Confirm clearing the
     Clear pending queue (does not touch current run or history).
     """
     if not yes:
-        console.print("[yellow]Refusing to clear queue without --yes.[/yellow]")
+        _console().print("[yellow]Refusing to clear queue without --yes.[/yellow]")
         raise typer.Exit(code=1)
     sess = _session_for_reporting()
     if not sess:
-        console.print("[dim]No sessions found.[/dim]")
+        _console().print("[dim]No sessions found.[/dim]")
         raise typer.Exit(code=0)
     clear_queue_state(sess)
-    console.print("[green]Cleared pending queue.[/green]")
+    _console().print("[green]Cleared pending queue.[/green]")
 
 @app.command("cancel")
 def cmd_cancel() -> None:
@@ -195,12 +221,17 @@ def cmd_cancel() -> None:
     """
     sess = _session_for_reporting()
     if not sess:
-        console.print("[dim]No sessions found.[/dim]")
+        _console().print("[dim]No sessions found.[/dim]")
         raise typer.Exit(code=0)
     st = load_state(sess)
     st.stop_requested = True
     save_state(sess, st)
-    console.print("[yellow]Stop requested. Worker will exit after the current run.[/yellow]")
+    # state.json remains the crash-safe record; the signal just delivers it immediately.
+    # Only a session with a live worker is signalled, never the latest-session fallback
+    active = active_session()
+    if active is not None and active.root == sess.root:
+        notify_worker_stop(active)
+    _console().print("[yellow]Stop requested. Worker will exit after the current run.[/yellow]")
 
 @app.command("kill")
 def cmd_kill(grace: float = typer.Option(5.0, "--grace", help="Seconds to wait before SIGKILL")) -> None:
@@ -209,7 +240,7 @@ def cmd_kill(grace: float = typer.Option(5.0, "--grace", help="Seconds to wait b
     """
     sess = active_session()
     if not sess:
-        console.print("[dim]No active worker.[/dim]")
+        _console().print("[dim]No active worker.[/dim]")
         raise typer.Exit(code=0)
     st = load_state(sess)
     cur = st.current or {}
@@ -221,20 +252,21 @@ def cmd_kill(grace: float = typer.Option(5.0, "--grace", help="Seconds to wait b
         except (ProcessLookupError, PermissionError, OSError):
             pgid = None
     if pgid is None:
-        console.print("[yellow]No running process to kill.[/yellow]")
+        _console().print("[yellow]No running process to kill.[/yellow]")
         raise typer.Exit(code=0)
 
-    try:
-        kill_with_grace(int(pgid), grace_seconds=float(grace))
-    finally:
-        # Mark as canceled; worker will observe this on wait()
-        cur["status"] = "canceled"
-        cur["error"] = cur.get("error") or "killed by user"
-        st.current = cur
+    # Save before killing so the worker can't finish this run and pop the next item first;
+    # the worker notices the canceled mark and kills/reaps the run itself
+    cur["status"] = "canceled"
+    cur["error"] = cur.get("error") or "killed by user"
+    cur["kill_grace"] = float(grace)
+    st.current = cur
     # Also clear any pending items to align with expected behavior
     st.queue = []
     save_state(sess, st)
-    console.print("[red]Kill signal sent. Marked current run as canceled and cleared pending queue.[/red]")
+    # Still signal from here in case the worker is gone or wedged
+    kill_with_grace(int(pgid), grace_seconds=float(grace))
+    _console().print("[red]Kill signal sent. Marked current run as canceled and cleared pending queue.[/red]")
 
 @app.command("abort")
 def cmd_abort(
@@ -246,7 +278,7 @@ def cmd_abort(
     """
     sess = _session_for_reporting()
     if not sess:
-        console.print("[dim]No sessions found.[/dim]")
+        _console().print("[dim]No sessions found.[/dim]")
         raise typer.Exit(code=0)
 
     st = load_state(sess)
@@ -259,22 +291,28 @@ def cmd_abort(
         except (ProcessLookupError, PermissionError, OSError):
             pgid = None
     if pgid is not None:
-        try:
-            kill_with_grace(int(pgid), grace_seconds=float(grace))
-        except OSError:
-            pass
         cur["status"] = "canceled"
         cur["error"] = cur.get("error") or "killed by user"
+        cur["kill_grace"] = float(grace)
         st.current = cur
 
     if not no_clear_queue:
         st.queue = []
 
     st.stop_requested = True
+    # Save before killing, as in kill: the worker acts on the canceled mark and stop flag
     save_state(sess, st)
-    console.print("[red]Abort requested.[/red] Current killed (if running), queue cleared, worker will stop.")
+    if pgid is not None:
+        try:
+            kill_with_grace(int(pgid), grace_seconds=float(grace))
+        except OSError:
+            pass
+    _console().print("[red]Abort requested.[/red] Current killed (if running), queue cleared, worker will stop.")
 
 def main() -> None:
+    # NBQ home and session lookups are memoized per invocation; start from a fresh scan
+    base_dir.cache_clear()
+    clear_sessions_cache()
     # If invoked without subcommand, print banner + version before help
     try:
         if len(sys.argv) == 1:
@@ -1,17 +1,13 @@
 from __future__ import annotations
 
 import os
-import shutil
 import subprocess
 import sys
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
-import jupytext  # type: ignore
-import nbformat  # type: ignore
-
-from .utils import atomic_write_json, ensure_dir, iso_now, run_id
+from .utils import atomic_write_json, ensure_dir, fast_copy, iso_now, run_id
 
 
 @dataclass
@@ -32,16 +28,22 @@ def prepare_run(queued_file: Path, session_root_dir: Path) -> PreparedRun:
     run_dir = session_root_dir / rid
     ensure_dir(run_dir)
 
-    queued_file = queued_file.resolve()
+    # queued_file is our own absolute snapshot path; no realpath walk needed
     ext = queued_file.suffix.lower()
     source_copy = run_dir / f"source{ext}"
-    shutil.copy2(queued_file, source_copy)
+    # Own copy (reflink where supported), never a hardlink: queue snapshots share an inode with
+    # their .by-hash blob, so editing a run's source.* in place would poison later enqueues
+    fast_copy(queued_file, source_copy, link=False)
 
     input_ipynb = run_dir / "input.ipynb"
     executed_ipynb = run_dir / "executed.ipynb"
     if ext == ".ipynb":
         input_ipynb = source_copy
     else:
+        # Imported lazily: only the worker pays for the Jupyter stack
+        import jupytext  # type: ignore
+        import nbformat  # type: ignore
+
         nb = jupytext.read(str(source_copy))  # auto-detect percent or other formats
         nbformat.write(nb, str(input_ipynb))
 
@@ -54,10 +56,11 @@ def prepare_run(queued_file: Path, session_root_dir: Path) -> PreparedRun:
         log_path=log_path,
     )
 
-def launch_papermill(input_ipynb: Path, executed_ipynb: Path, kernel: str, timeout: Optional[int], log_path: Path) -> subprocess.Popen:
+def launch_papermill(input_ipynb: Path, executed_ipynb: Path, kernel: str, timeout: Optional[int], log_path: Path) -> Tuple[subprocess.Popen, int]:
     """
     Launch papermill as a subprocess, streaming stdout/stderr to log_path.
-    Returns the Popen handle. Uses start_new_session=True so child becomes a PGID leader.
+    Returns (Popen handle, pgid). Uses start_new_session=True so the child is a session and
+    PGID leader, hence pgid == pid without a getpgid call that could race the child's exit.
     """
     args = [
         sys.executable, "-m", "papermill",
@@ -68,24 +71,39 @@ def launch_papermill(input_ipynb: Path, executed_ipynb: Path, kernel: str, timeo
     if timeout is not None:
         args += ["--execution-timeout", str(timeout)]
 
-    log_f = open(log_path, "a", encoding="utf-8")
-    env = os.environ.copy()
-    env.setdefault("PYTHONUNBUFFERED", "1")
+    # env=None inherits os.environ; only build a copy when an override is needed
+    env = None if "PYTHONUNBUFFERED" in os.environ else {**os.environ, "PYTHONUNBUFFERED": "1"}
 
-    proc = subprocess.Popen(
-        args,
-        stdout=log_f,
-        stderr=log_f,
-        cwd=str(input_ipynb.parent),
-        env=env,
-        start_new_session=True,
-    )
-    return proc
+    # Raw append-only fd for the child; our copy is closed once the child holds it
+    log_fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+    try:
+        proc = subprocess.Popen(
+            args,
+            stdout=log_fd,
+            stderr=log_fd,
+            cwd=str(input_ipynb.parent),
+            env=env,
+            start_new_session=True,
+        )
+    finally:
+        os.close(log_fd)
+    return proc, proc.pid
 
-def write_status_json(run_dir: Path, success: bool, returncode: int, error: Optional[str]) -> None:
+def write_status_json(
+    run_dir: Path,
+    success: bool,
+    returncode: int,
+    error: Optional[str],
+    started_at: Optional[str] = None,
+    ended_at: Optional[str] = None,
+) -> None:
+    """
+    Write run result metadata; started_at is the launch time recorded by the worker.
+    """
+    ended_at = ended_at or iso_now()
     status = {
-        "started_at": iso_now(),
-        "ended_at": iso_now(),
+        "started_at": started_at or ended_at,
+        "ended_at": ended_at,
         "success": bool(success),
         "returncode": int(returncode),
         "error": error,
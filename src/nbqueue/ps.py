@@ -2,27 +2,95 @@ from __future__ import annotations
 
 import os
 import signal
+import subprocess
 import time
-from typing import Optional
+from typing import Dict, Optional
 
-from .state import Session, read_lock_pid, is_pid_alive
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # Non-POSIX: lock staleness falls back to a pid liveness check
+
+from .state import Session, clear_active_link, is_pid_alive, read_lock_pid, set_active_link
+from .utils import lock_file_held
+
+# Signal asking a worker to stop after its current run (mirrors state.stop_requested)
+STOP_SIGNAL: Optional[int] = getattr(signal, "SIGUSR1", None)
+
+# lock.pid fds held open (and flocked) by this process while it is the worker
+_held_lock_fds: Dict[str, int] = {}
+
+def _try_lock_exclusive(fd: int) -> bool:
+    # A few quick retries: lock_file_held probes take a momentary shared lock
+    for _ in range(3):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            time.sleep(0.01)
+    return False
+
+def _lock_is_stale(session: Session, fd: int) -> bool:
+    # With flock, whoever can take the existing file's lock knows its holder is gone
+    if fcntl is not None:
+        return _try_lock_exclusive(fd)
+    pid = read_lock_pid(session)
+    return not (pid and is_pid_alive(pid))
 
 def acquire_lock(session: Session) -> bool:
     """
     Acquire single-worker lock. Returns True if acquired, False if another live worker holds it.
-    Removes stale locks automatically.
+    The pid is written to a private file, flocked, and hard-linked into place (link fails with
+    EEXIST like O_CREAT|O_EXCL), so readers never observe an empty lock. The flock is held until
+    release_lock. A stale lock is taken over only while holding its flock, then atomically
+    replaced, so two racing workers can't both win.
     """
     lp = session.lock_path
     lp.parent.mkdir(parents=True, exist_ok=True)
-    pid = read_lock_pid(session)
-    if pid and is_pid_alive(pid):
-        return False
-    # stale or missing -> write our pid
+    tmp = lp.with_name(f".{lp.name}.{os.getpid()}")
     try:
-        lp.write_text(str(os.getpid()), encoding="utf-8")
-        return True
-    except Exception:
+        fd = os.open(tmp, os.O_CREAT | os.O_TRUNC | os.O_RDWR, 0o644)
+    except OSError:
         return False
+    acquired = False
+    try:
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)  # our own fresh inode: uncontended
+        for _ in range(3):
+            try:
+                os.link(tmp, lp)
+                acquired = True
+                break
+            except FileExistsError:
+                pass
+            try:
+                old = os.open(lp, os.O_RDONLY)
+            except FileNotFoundError:
+                continue  # released meanwhile
+            try:
+                if not _lock_is_stale(session, old):
+                    return False
+                try:
+                    if os.fstat(old).st_ino != os.stat(lp).st_ino:
+                        continue  # another worker replaced it first; judge the new one
+                except FileNotFoundError:
+                    continue
+                os.replace(tmp, lp)
+                acquired = True
+                break
+            finally:
+                os.close(old)
+    except OSError:
+        acquired = False
+    finally:
+        tmp.unlink(missing_ok=True)
+        if not acquired:
+            os.close(fd)
+    if acquired:
+        _held_lock_fds[str(lp)] = fd
+        set_active_link(session)
+    return acquired
 
 def release_lock(session: Session) -> None:
     """
@@ -31,9 +99,30 @@ def release_lock(session: Session) -> None:
     try:
         pid = read_lock_pid(session)
         if pid == os.getpid() and session.lock_path.exists():
+            clear_active_link(session)
             session.lock_path.unlink(missing_ok=True)
     except Exception:
         pass
+    fd = _held_lock_fds.pop(str(session.lock_path), None)
+    if fd is not None:
+        os.close(fd)
+
+def notify_worker_stop(session: Session) -> bool:
+    """
+    Deliver STOP_SIGNAL to the session's live worker. Returns True if a signal was sent.
+    Only signals when a process holds lock.pid's flock: a stale lock's pid may since have been
+    reused by an unrelated process, which SIGUSR1 would terminate.
+    """
+    pid = read_lock_pid(session)
+    if STOP_SIGNAL is None or not pid or pid == os.getpid():
+        return False
+    if lock_file_held(session.lock_path) is not True:
+        return False
+    try:
+        os.kill(pid, STOP_SIGNAL)
+        return True
+    except (ProcessLookupError, PermissionError):
+        return False
 
 def get_pgid(pid: int) -> Optional[int]:
     try:
@@ -53,16 +142,36 @@ def send_signal_to_pgid(pgid: int, sig: int) -> None:
         # Best-effort
         pass
 
-def kill_with_grace(pgid: int, grace_seconds: float = 5.0) -> None:
+def pgid_alive(pgid: int) -> bool:
+    """
+    True if any process in the group still exists (signal 0 probe).
+    """
+    try:
+        os.killpg(pgid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+def kill_with_grace(pgid: int, grace_seconds: float = 5.0, proc: Optional[subprocess.Popen] = None) -> None:
     """
-    SIGTERM the process group, wait up to grace_seconds, then SIGKILL.
+    SIGTERM the process group, wait up to grace_seconds for it to exit, then SIGKILL.
+    Returns as soon as the group is empty. Pass `proc` when the caller is the leader's
+    parent so the exited leader gets reaped instead of lingering as a zombie group member.
     """
     send_signal_to_pgid(pgid, signal.SIGTERM)
-    waited = 0.0
-    step = 0.1
-    while waited < grace_seconds:
-        time.sleep(step)
-        waited += step
-        # No portable way to check if group is empty; we just try KILL after grace.
-        # Early exit possible if all procs have died, but we keep it simple.
+    deadline = time.monotonic() + grace_seconds
+    step = 0.01
+    max_step = max(step, grace_seconds / 4)
+    while True:
+        if proc is not None:
+            proc.poll()
+        if not pgid_alive(pgid):
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(step, remaining))
+        step = min(step * 2, max_step)
     send_signal_to_pgid(pgid, signal.SIGKILL)
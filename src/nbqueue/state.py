@@ -1,14 +1,48 @@
 from __future__ import annotations
 
+import hashlib
 import os
-from dataclasses import asdict, dataclass, field
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
-from .utils import atomic_write_json, base_dir, ensure_dir, iso_now, timestamp_id, sanitize_tag, read_json
+from .utils import (
+    append_journal,
+    append_json_lines,
+    atomic_write_bytes,
+    base_dir,
+    ensure_dir,
+    iso_now,
+    journal_locked,
+    json_dumps,
+    lock_file_held,
+    read_journal,
+    read_json,
+    read_json_lines,
+    read_json_lines_tail,
+    rotate_journal,
+    sanitize_tag,
+    timestamp_id,
+)
 
 STATE_FILENAME = "state.json"
 LOCK_FILENAME = "lock.pid"
+QUEUE_LOG_FILENAME = "queue.log"
+HISTORY_FILENAME = "history.jsonl"
+ACTIVE_LINK_NAME = "active"
+
+def _history_limit() -> int:
+    # NBQ_HISTORY_LIMIT bounds how many recent runs are loaded (history.jsonl keeps them all); 0 = no limit
+    try:
+        limit = int(os.environ.get("NBQ_HISTORY_LIMIT", "1000"))
+    except ValueError:
+        return 1000
+    # Negative values are invalid, not "unlimited": only an explicit 0 lifts the bound
+    return limit if limit >= 0 else 1000
+
+HISTORY_LIMIT = _history_limit()
 
 @dataclass
 class QueueItem:
@@ -31,19 +65,32 @@ class QueueItem:
     def make(original_path: Path, queue_path: Path, tag: Optional[str]) -> "QueueItem":
         return QueueItem(
             id=timestamp_id(),
-            original_path=str(original_path.resolve()),
-            queue_path=str(queue_path.resolve()),
+            # abspath is pure string work; symlink resolution is not needed for metadata
+            original_path=os.path.abspath(original_path),
+            queue_path=os.path.abspath(queue_path),
             added_at=iso_now(),
             status="queued",
             tag=sanitize_tag(tag),
         )
 
+    def to_dict(self) -> Dict[str, Any]:
+        # All fields are flat scalars, so a shallow copy avoids asdict()'s recursive deepcopy
+        return dict(self.__dict__)
+
 @dataclass
 class State:
     queue: List[Dict[str, Any]] = field(default_factory=list)
-    history: List[Dict[str, Any]] = field(default_factory=list)
+    # History embedded in state.json by older versions; carried through unchanged.
+    # New entries are appended to history.jsonl (see append_history).
+    legacy_history: List[Dict[str, Any]] = field(default_factory=list)
     current: Optional[Dict[str, Any]] = None
     stop_requested: bool = False
+    # Position in queue.log (generation token, byte offset) up to which enqueues are merged into `queue`
+    queue_log_token: Optional[str] = field(default=None, repr=False, compare=False)
+    queue_log_offset: int = field(default=0, repr=False, compare=False)
+    # Digest of the serialized state as loaded; save_state skips unchanged writes
+    loaded_digest: Optional[str] = field(default=None, repr=False, compare=False)
+    history_path: Optional[Path] = field(default=None, repr=False, compare=False)
 
     @staticmethod
     def default() -> "State":
@@ -52,19 +99,38 @@ class State:
     @staticmethod
     def from_dict(d: Dict[str, Any]) -> "State":
         try:
+            log_pos = d.get("queue_log") or {}
             return State(
                 queue=list(d.get("queue", [])),
-                history=list(d.get("history", [])),
+                legacy_history=list(d.get("history", [])),
                 current=d.get("current"),
                 stop_requested=bool(d.get("stop_requested", False)),
+                queue_log_token=log_pos.get("token"),
+                queue_log_offset=int(log_pos.get("offset", 0)),
             )
         except Exception:
             return State.default()
 
+    @property
+    def history(self) -> List[Dict[str, Any]]:
+        """
+        Most recent HISTORY_LIMIT runs, oldest first; the complete record stays in history.jsonl.
+        history.jsonl is only read when this is accessed, and only its tail.
+        """
+        limit = HISTORY_LIMIT or None
+        entries: deque = deque(self.legacy_history, maxlen=limit)
+        if self.history_path is not None:
+            if limit is None:
+                entries.extend(read_json_lines(self.history_path)[0])
+            else:
+                entries.extend(read_json_lines_tail(self.history_path, limit))
+        return list(entries)
+
     def to_dict(self) -> Dict[str, Any]:
+        # state.json layout (save_state adds the queue.log position); use `history` for run history
         return {
             "queue": self.queue,
-            "history": self.history,
+            "history": self.legacy_history,
             "current": self.current,
             "stop_requested": self.stop_requested,
         }
@@ -76,6 +142,8 @@ class Session:
         self.output_dir = self.root / "output"
         self.logs_dir = self.root / "logs"
         self.state_path = self.root / STATE_FILENAME
+        self.queue_log_path = self.root / QUEUE_LOG_FILENAME
+        self.history_path = self.root / HISTORY_FILENAME
         self.lock_path = self.root / LOCK_FILENAME
         self.latest_run_link = self.root / "latest_run"
 
@@ -95,17 +163,33 @@ def new_session() -> Session:
     root = sessions_base() / sid
     s = Session(root)
     s.ensure_layout()
+    clear_sessions_cache()
     return s
 
 def list_sessions() -> list[Session]:
     base = sessions_base()
     ensure_dir(base)
-    sessions: list[Session] = []
-    for child in base.iterdir():
-        if child.is_dir() and (child / STATE_FILENAME).exists():
-            sessions.append(Session(child))
-    sessions.sort(key=lambda x: x.root.name)
-    return sessions
+    found: list[tuple[str, str]] = []
+    # scandir yields the entry type from getdents, so only state.json needs a stat
+    with os.scandir(base) as it:
+        for entry in it:
+            if not entry.is_dir(follow_symlinks=False):
+                continue  # files and symlinks such as the `active` pointer
+            if os.path.exists(os.path.join(entry.path, STATE_FILENAME)):
+                found.append((entry.name, entry.path))
+    # Session IDs sort chronologically; names are unique so tuples compare on name alone
+    found.sort()
+    return [Session(Path(path)) for _, path in found]
+
+@lru_cache(maxsize=1)
+def _cached_list_sessions() -> tuple[Session, ...]:
+    """
+    Sessions listing shared by all lookups within one CLI invocation.
+    """
+    return tuple(list_sessions())
+
+def clear_sessions_cache() -> None:
+    _cached_list_sessions.cache_clear()
 
 def read_lock_pid(session: Session) -> Optional[int]:
     try:
@@ -125,37 +209,153 @@ def is_pid_alive(pid: int) -> bool:
     except PermissionError:
         return True
 
-def active_session() -> Optional[Session]:
-    for s in reversed(list_sessions()):
-        pid = read_lock_pid(s)
-        if pid and is_pid_alive(pid):
+def _has_live_worker(session: Session) -> bool:
+    # The worker holds an exclusive flock on lock.pid for its lifetime, which a reused pid can't fake
+    held = lock_file_held(session.lock_path)
+    if held is not None:
+        return held
+    pid = read_lock_pid(session)
+    return bool(pid and is_pid_alive(pid))
+
+def set_active_link(session: Session) -> None:
+    """
+    Atomically point NBQ_HOME/active at this session (best-effort).
+    """
+    link = sessions_base() / ACTIVE_LINK_NAME
+    tmp = link.with_name(f".{ACTIVE_LINK_NAME}.{os.getpid()}")
+    try:
+        if tmp.is_symlink():
+            tmp.unlink()
+        tmp.symlink_to(session.root.name, target_is_directory=True)
+        os.replace(tmp, link)
+    except OSError:
+        pass
+
+def clear_active_link(session: Session) -> None:
+    """
+    Remove NBQ_HOME/active if it still points at this session.
+    """
+    link = sessions_base() / ACTIVE_LINK_NAME
+    try:
+        if os.readlink(link) == session.root.name:
+            link.unlink()
+    except OSError:
+        pass
+
+def _linked_active() -> Optional[Session]:
+    base = sessions_base()
+    try:
+        target = os.readlink(base / ACTIVE_LINK_NAME)
+    except OSError:
+        return None
+    s = Session(base / target)
+    return s if _has_live_worker(s) else None
+
+def _find_active(sessions: tuple[Session, ...]) -> Optional[Session]:
+    for s in reversed(sessions):
+        if _has_live_worker(s):
             return s
     return None
 
+def active_session() -> Optional[Session]:
+    # Fast path: the worker-maintained symlink; full scan only if it is missing or stale
+    return _linked_active() or _find_active(_cached_list_sessions())
+
 def latest_session() -> Optional[Session]:
-    sessions = list_sessions()
+    sessions = _cached_list_sessions()
     return sessions[-1] if sessions else None
 
-def get_or_create_session() -> Session:
-    s = active_session()
+def reporting_session() -> Optional[Session]:
+    """
+    Active session if a worker is alive, else the most recent one (single directory scan).
+    """
+    s = _linked_active()
     if s:
         return s
-    s2 = latest_session()
-    if s2:
-        return s2
-    return new_session()
+    sessions = _cached_list_sessions()
+    return _find_active(sessions) or (sessions[-1] if sessions else None)
+
+def get_or_create_session() -> Session:
+    return reporting_session() or new_session()
 
 def load_state(session: Session) -> State:
+    """
+    Load state.json and merge any enqueues journaled in queue.log after the position it records.
+    """
     data = read_json(session.state_path, default=State.default().to_dict())
-    return State.from_dict(data)
+    st = State.from_dict(data)
+    pending, st.queue_log_token, st.queue_log_offset = read_journal(
+        session.queue_log_path, st.queue_log_token, st.queue_log_offset
+    )
+    st.queue.extend(pending)
+    st.history_path = session.history_path
+    st.loaded_digest = _digest(_serialize(st))
+    return st
+
+def _serialize(state: State) -> bytes:
+    data = state.to_dict()
+    data["queue_log"] = {"token": state.queue_log_token, "offset": state.queue_log_offset}
+    return json_dumps(data, indent=True)
+
+def _digest(payload: bytes) -> str:
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
 
 def save_state(session: Session, state: State) -> None:
-    atomic_write_json(session.state_path, state.to_dict())
+    payload = _serialize(state)
+    digest = _digest(payload)
+    if digest == state.loaded_digest:
+        # Nothing changed since load; any merged journal lines simply stay in queue.log
+        return
+    # Write under the journal lock so compaction only ever judges the state.json actually on disk
+    with journal_locked(session.queue_log_path) as fd:
+        atomic_write_bytes(session.state_path, payload)
+        rotated = rotate_journal(session.queue_log_path, fd, state.queue_log_token, state.queue_log_offset)
+    state.loaded_digest = digest
+    if rotated is not None:
+        # state.json still names the old generation (now queue.log.prev, fully merged): same meaning
+        state.queue_log_token, state.queue_log_offset = rotated
+        state.loaded_digest = _digest(_serialize(state))
+
+class StateTransaction:
+    """
+    Hold a loaded State in memory and persist it once when the block exits.
+    Use flush() where other processes must observe progress, and reload() to pick up
+    changes they made (e.g. after waiting on a long-running child).
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.state = State.default()
+
+    def __enter__(self) -> "StateTransaction":
+        self.state = load_state(self.session)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        save_state(self.session, self.state)
+        return False
+
+    def flush(self) -> None:
+        save_state(self.session, self.state)
+
+    def reload(self) -> State:
+        self.state = load_state(self.session)
+        return self.state
 
 def append_queue(session: Session, item: QueueItem) -> None:
-    st = load_state(session)
-    st.queue.append(asdict(item))
-    save_state(session, st)
+    append_queue_many(session, [item])
+
+def append_queue_many(session: Session, items: Iterable[QueueItem]) -> None:
+    """
+    Journal items to queue.log with one append; state.json is not rewritten.
+    """
+    append_journal(session.queue_log_path, (i.to_dict() for i in items))
+
+def append_history(session: Session, item: Dict[str, Any]) -> None:
+    """
+    Record a finished item with one append to history.jsonl; state.json is not rewritten.
+    """
+    append_json_lines(session.history_path, [item])
 
 def clear_queue(session: Session) -> None:
     st = load_state(session)
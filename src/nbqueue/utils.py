@@ -1,27 +1,39 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import os
-import random
 import re
 import shutil
 import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterable, Iterator, Optional
 
 try:
-    import nbformat  # type: ignore
-except Exception:  # pragma: no cover
-    nbformat = None  # Will be required at runtime for .ipynb handling
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None  # Optional speedup; stdlib json is used otherwise
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # Non-POSIX: journal access is unlocked best-effort
 
 SAFE_TAG_RE = re.compile(r"[^A-Za-z0-9_\-]+")
+DASH_RUN_RE = re.compile(r"-{2,}")
+_UTC = timezone.utc
+HASH_STORE_DIRNAME = ".by-hash"
+FICLONE = 0x40049409  # Linux ioctl: share extents with another file (reflink)
 
+@lru_cache(maxsize=1)
 def base_dir() -> Path:
     """
     Resolve the NBQ home directory.
     Default is ./nbqueue (relative to CWD) unless NBQ_HOME is set.
-    Returns an absolute Path.
+    Returns an absolute Path, cached for the process (base_dir.cache_clear() after changing NBQ_HOME/CWD).
     """
     env = os.environ.get("NBQ_HOME")
     if env:
@@ -33,59 +45,507 @@ def ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
 def iso_now() -> str:
-    # Truncate to seconds for stable diffs
-    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    # Truncate to seconds for stable diffs; gmtime+strftime skips building a datetime
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
 def timestamp_id() -> str:
     # Session ID friendly ISO-like (file-system safe)
-    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H-%M-%SZ")
+    return time.strftime("%Y-%m-%dT%H-%M-%SZ", time.gmtime())
 
 def run_id() -> str:
     # Monotonic-ish, high-resolution
-    return f"{int(time.time()*1000)}-{random.randrange(16**4):04x}"
+    return f"{time.time_ns() // 1_000_000}-{os.urandom(2).hex()}"
 
+@lru_cache(maxsize=256)
 def sanitize_tag(tag: Optional[str]) -> Optional[str]:
     if not tag:
         return None
     tag = tag.strip().replace(" ", "-")
     tag = SAFE_TAG_RE.sub("-", tag)
-    tag = re.sub(r"-{2,}", "-", tag).strip("-")
+    tag = DASH_RUN_RE.sub("-", tag).strip("-")
     return tag or None
 
-def atomic_write_json(path: Path, data: Any) -> None:
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, sort_keys=False)
-        f.flush()
-        os.fsync(f.fileno())
+def json_dumps(data: Any, indent: bool = False) -> bytes:
+    """
+    Serialize to UTF-8 JSON bytes, using orjson when installed.
+    indent=True produces the on-disk file layout (2-space indent, trailing newline).
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=(orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE) if indent else 0)
+    if indent:
+        return (json.dumps(data, indent=2, sort_keys=False) + "\n").encode("utf-8")
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+def json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _fsync_enabled(durable: bool) -> bool:
+    # NBQ_FSYNC=1 forces fsync on every write, NBQ_FSYNC=0 disables it; unset uses the caller's choice
+    env = os.environ.get("NBQ_FSYNC")
+    if env is None:
+        return durable
+    return env != "0"
+
+def _write_all(fd: int, payload: bytes, durable: bool) -> None:
+    view = memoryview(payload)
+    while view:
+        view = view[os.write(fd, view):]
+    if _fsync_enabled(durable):
+        os.fsync(fd)
+
+# Cleared after the first failure so unsupported systems don't pay for a wasted write each time
+_tmpfile_link_ok = hasattr(os, "O_TMPFILE")
+
+def _write_anonymous_then_link(path: Path, tmp: Path, payload: bytes, durable: bool) -> bool:
+    """
+    Linux: write payload to an unnamed O_TMPFILE inode and only then give it the name tmp,
+    so a crash mid-write leaves no partial file behind. Returns False if unsupported here.
+    """
+    global _tmpfile_link_ok
+    if not _tmpfile_link_ok:
+        return False
+    try:
+        fd = os.open(path.parent, os.O_TMPFILE | os.O_WRONLY, 0o644)
+    except OSError:
+        _tmpfile_link_ok = False  # filesystem or kernel without O_TMPFILE
+        return False
+    try:
+        _write_all(fd, payload, durable)
+        tmp.unlink(missing_ok=True)  # left over from a crashed writer that had our pid
+        try:
+            os.link(f"/proc/self/fd/{fd}", tmp)
+        except OSError:
+            _tmpfile_link_ok = False  # e.g. /proc not mounted, or a sandboxed /proc
+            return False
+    finally:
+        os.close(fd)
+    return True
+
+def atomic_write_bytes(path: Path, payload: bytes, durable: bool = False) -> None:
+    """
+    Write payload to a temp file with raw syscalls and rename it over path.
+    The rename alone is atomic; `durable` adds an fsync so the data also survives power loss.
+    The temp name is per-process so concurrent writers (CLI and worker) never share it;
+    where O_TMPFILE works it is only linked into place once fully written.
+    """
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    if not _write_anonymous_then_link(path, tmp, payload, durable):
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            _write_all(fd, payload, durable)
+        finally:
+            os.close(fd)
     os.replace(tmp, path)
 
+def atomic_write_json(path: Path, data: Any, durable: bool = False) -> None:
+    atomic_write_bytes(path, json_dumps(data, indent=True), durable=durable)
+
 def read_json(path: Path, default: Any) -> Any:
     try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
+        return json_loads(path.read_bytes())
     except Exception:
         return default
 
-def copy_and_clear_ipynb(src: Path, dst: Path) -> None:
+def _flock(fd: int, exclusive: bool) -> None:
+    # Lock is released when fd is closed
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+def lock_file_held(path: Path) -> Optional[bool]:
     """
-    Copy .ipynb from src to dst, clearing outputs.
-    Requires nbformat.
+    Whether another process holds an exclusive flock on path, probed without blocking.
+    None when this can't be told (no fcntl, or the file can't be opened for another reason).
+    """
+    if fcntl is None:
+        return None
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        return False
+    except BlockingIOError:
+        return True
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+def append_json_lines(path: Path, records: Iterable[Any]) -> None:
+    """
+    Append records as JSON lines with a single write under an exclusive lock.
+    """
+    payload = b"".join(json_dumps(r) + b"\n" for r in records)
+    if not payload:
+        return
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        _flock(fd, exclusive=True)
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
+
+def _parse_json_lines(data: bytes, start: int = 0) -> tuple[list[Any], int]:
+    # Complete lines from `start`; returns (records, offset just past the last line consumed)
+    end = start + data[start:].rfind(b"\n") + 1
+    records: list[Any] = []
+    for line in data[start:end].splitlines():
+        try:
+            records.append(json_loads(line))
+        except ValueError:
+            continue
+    return records, end
+
+def read_json_lines(path: Path) -> tuple[list[Any], int]:
+    """
+    Read all complete JSON lines from path.
+    Returns (records, byte offset just past the last line consumed); undecodable lines are skipped.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return [], 0
+    try:
+        _flock(fd, exclusive=False)
+        with os.fdopen(os.dup(fd), "rb") as f:
+            data = f.read()
+    finally:
+        os.close(fd)
+    return _parse_json_lines(data)
+
+def read_json_lines_tail(path: Path, limit: int) -> list[Any]:
+    """
+    Read the last `limit` complete JSON lines from path, scanning backwards in blocks
+    so the cost tracks `limit` rather than the file size. Undecodable lines are skipped.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return []
+    chunks: list[bytes] = []
+    newlines = 0
+    try:
+        _flock(fd, exclusive=False)
+        pos = os.fstat(fd).st_size
+        # limit + 1 newlines guarantee `limit` whole lines even if the first chunk starts mid-line
+        while pos > 0 and newlines <= limit:
+            step = min(1 << 16, pos)
+            pos -= step
+            chunk = os.pread(fd, step, pos)
+            newlines += chunk.count(b"\n")
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+    data = b"".join(reversed(chunks))
+    lines = data[: data.rfind(b"\n") + 1].splitlines()
+    if pos > 0:
+        lines = lines[1:]
+    records: list[Any] = []
+    for line in lines[-limit:]:
+        try:
+            records.append(json_loads(line))
+        except ValueError:
+            continue
+    return records
+
+# Journals (queue.log) are JSON lines files that start with a {"journal": <token>} header line.
+# Each compaction starts a new generation with a fresh token and keeps the previous one as
+# <name>.prev, so a reader's (token, offset) position stays meaningful across compactions.
+JOURNAL_PREV_SUFFIX = ".prev"
+
+def _journal_header(token: str) -> bytes:
+    return json_dumps({"journal": token}) + b"\n"
+
+def _split_journal_header(data: bytes) -> tuple[Optional[str], int]:
+    # (token, offset of the first record); headerless files come from older versions
+    nl = data.find(b"\n")
+    if nl > 0:
+        try:
+            head = json_loads(data[:nl])
+        except ValueError:
+            head = None
+        if isinstance(head, dict) and list(head) == ["journal"]:
+            return head["journal"], nl + 1
+    return None, 0
+
+def _open_journal(path: Path, flags: int, exclusive: bool) -> int:
+    # Lock the journal's current generation, retrying if a compaction swapped it meanwhile
+    while True:
+        fd = os.open(path, flags, 0o644)
+        try:
+            _flock(fd, exclusive)
+            if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
+
+def _read_fd(fd: int) -> bytes:
+    with os.fdopen(os.dup(fd), "rb") as f:
+        f.seek(0)
+        return f.read()
+
+def append_journal(path: Path, records: Iterable[Any]) -> None:
+    """
+    Append records to the journal at path with a single write, creating its header if new.
+    """
+    payload = b"".join(json_dumps(r) + b"\n" for r in records)
+    if not payload:
+        return
+    fd = _open_journal(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, exclusive=True)
+    try:
+        if os.fstat(fd).st_size == 0:
+            payload = _journal_header(os.urandom(8).hex()) + payload
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
+
+def read_journal(path: Path, token: Optional[str], offset: int) -> tuple[list[Any], Optional[str], int]:
+    """
+    Records appended to the journal at path after position (token, offset).
+    A position in the previous generation resumes there and continues through the current one;
+    an unknown position reads both generations whole.
+    Returns (records, current token, offset just past the last record consumed).
+    """
+    try:
+        fd = _open_journal(path, os.O_RDONLY, exclusive=False)
+    except FileNotFoundError:
+        return [], None, 0
+    try:
+        data = _read_fd(fd)
+        records: list[Any] = []
+        cur_token, start = _split_journal_header(data)
+        if cur_token == token:
+            start = max(start, offset)
+        else:
+            # .prev only changes under the current generation's exclusive lock, which we block
+            try:
+                prev = path.with_name(path.name + JOURNAL_PREV_SUFFIX).read_bytes()
+            except FileNotFoundError:
+                prev = b""
+            prev_token, prev_start = _split_journal_header(prev)
+            if prev and prev_token == token:
+                prev_start = max(prev_start, offset)
+            records.extend(_parse_json_lines(prev, prev_start)[0])
+    finally:
+        os.close(fd)
+    tail, end = _parse_json_lines(data, start)
+    records.extend(tail)
+    return records, cur_token, end
+
+@contextmanager
+def journal_locked(path: Path) -> Iterator[int]:
+    """
+    Hold the journal's exclusive lock (blocking appends and reads) for the duration of the block.
+    """
+    fd = _open_journal(path, os.O_RDONLY | os.O_CREAT, exclusive=True)
+    try:
+        yield fd
+    finally:
+        os.close(fd)
+
+def rotate_journal(path: Path, fd: int, token: Optional[str], offset: int) -> Optional[tuple[str, int]]:
+    """
+    Start a new journal generation if the current one (locked via journal_locked's fd) holds
+    nothing beyond (token, offset). The old generation replaces <name>.prev.
+    Returns the new (token, offset), or None if records remain or the swap is unsupported here.
+    """
+    size = os.fstat(fd).st_size
+    cur_token, start = _split_journal_header(os.pread(fd, 4096, 0))
+    if cur_token != token or size != offset or size <= start:
+        return None
+    new_token = os.urandom(8).hex()
+    header = _journal_header(new_token)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    prev = path.with_name(path.name + JOURNAL_PREV_SUFFIX)
+    try:
+        tmp.write_bytes(header)
+        prev.unlink(missing_ok=True)
+        # link + replace: the path always names a generation, so no append can land in a gap
+        os.link(path, prev)
+        os.replace(tmp, path)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        return None
+    return new_token, len(header)
+
+def _clone_or_range_copy(src: Path, dst: Path) -> bool:
+    """
+    Copy data in-kernel: reflink via FICLONE, else os.copy_file_range.
+    Returns False (leaving no dst behind) if neither is supported here.
+    """
+    if fcntl is None:
+        return False
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return True
+        except OSError:
+            pass
+        if hasattr(os, "copy_file_range"):
+            try:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if n == 0:
+                        break
+                    remaining -= n
+                if remaining == 0:
+                    return True
+            except OSError:
+                pass
+    dst.unlink(missing_ok=True)
+    return False
+
+def fast_copy(src: Path, dst: Path, link: bool = True) -> None:
+    """
+    Copy src to dst as cheaply as the filesystem allows:
+    hardlink (when `link`), reflink, os.copy_file_range, then shutil.copy2.
+    Only allow `link` for files that are never rewritten in place (e.g. queue snapshots).
+    Raises FileExistsError if linking finds dst present, and shutil.SameFileError if dst is src.
+    """
+    if link:
+        try:
+            os.link(src, dst)
+            return
+        except FileExistsError:
+            raise
+        except OSError:
+            pass  # cross-device or unsupported
+    try:
+        same = os.path.samefile(src, dst)
+    except FileNotFoundError:
+        same = False
+    if same:
+        # Opening dst for writing would truncate src as well
+        raise shutil.SameFileError(f"{src} and {dst} are the same file")
+    try:
+        if _clone_or_range_copy(src, dst):
+            shutil.copystat(src, dst)
+            return
+    except OSError:
+        pass
+    shutil.copy2(src, dst)
+
+def cleared_ipynb_bytes(src: Path) -> bytes:
+    """
+    Serialized .ipynb content of src with code cell outputs cleared.
+    v4+ notebooks are edited as plain JSON (no schema validation or NotebookNode tree);
+    older formats go through nbformat for upgrade.
     """
-    if nbformat is None:
-        raise RuntimeError("nbformat is required to handle .ipynb files")
+    nb = json.loads(src.read_bytes())
+    if not isinstance(nb, dict) or int(nb.get("nbformat", 0)) < 4:
+        return _cleared_ipynb_bytes_nbformat(src)
+    for cell in nb.get("cells", []):
+        if cell.get("cell_type") == "code":
+            cell["outputs"] = []
+            cell["execution_count"] = None
+    if (int(nb.get("nbformat", 0)), int(nb.get("nbformat_minor", 0))) >= (4, 5):
+        _fill_missing_cell_ids(nb.get("cells", []))
+    # Same layout nbformat writes, so snapshots diff cleanly against notebooks saved by Jupyter
+    return (json.dumps(nb, indent=1, sort_keys=True, ensure_ascii=False) + "\n").encode("utf-8")
+
+def _fill_missing_cell_ids(cells: list) -> None:
+    """
+    Give cells without an id one, as nbformat does when reading a v4.5+ notebook.
+    nbformat picks random ids; these derive from the cell so equal sources snapshot to equal bytes.
+    """
+    seen = {c["id"] for c in cells if isinstance(c.get("id"), str)}
+    for i, cell in enumerate(cells):
+        if isinstance(cell.get("id"), str):
+            continue
+        seed = json.dumps([i, cell.get("source", "")], ensure_ascii=False).encode("utf-8")
+        cid = hashlib.blake2b(seed, digest_size=4).hexdigest()
+        n = 0
+        while cid in seen:
+            n += 1
+            cid = hashlib.blake2b(seed + b"#%d" % n, digest_size=4).hexdigest()
+        cell["id"] = cid
+        seen.add(cid)
+
+def _cleared_ipynb_bytes_nbformat(src: Path) -> bytes:
+    """
+    nbformat-based fallback for pre-v4 notebooks.
+    Requires nbformat (imported on first use to keep CLI startup light).
+    """
+    try:
+        import nbformat  # type: ignore
+    except Exception as e:  # pragma: no cover
+        raise RuntimeError("nbformat is required to handle .ipynb files") from e
     nb = nbformat.read(str(src), as_version=4)
     for cell in nb.cells:
         if cell.get("cell_type") == "code":
             cell["outputs"] = []
             cell["execution_count"] = None
-    nbformat.write(nb, str(dst))
+    text = nbformat.writes(nb)
+    if not text.endswith("\n"):
+        text += "\n"
+    return text.encode("utf-8")
+
+def copy_and_clear_ipynb(src: Path, dst: Path) -> None:
+    """
+    Copy .ipynb from src to dst, clearing outputs.
+    """
+    dst.write_bytes(cleared_ipynb_bytes(src))
+
+def _file_digest(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _blob_intact(blob: Path, digest: str) -> bool:
+    # Snapshot names are hardlinks of the blob, so an in-place edit of one changes it too
+    try:
+        return _file_digest(blob) == digest
+    except FileNotFoundError:
+        return False
+
+def store_by_hash(store_dir: Path, data: bytes, ext: str) -> Path:
+    """
+    Content-addressed blob for data under store_dir; (re)written unless an intact copy is present.
+    """
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    blob = store_dir / f"{digest}{ext}"
+    if not _blob_intact(blob, digest):
+        ensure_dir(store_dir)
+        tmp = blob.with_name(f"{blob.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, blob)
+    return blob
+
+def store_file_by_hash(store_dir: Path, src: Path, ext: str) -> Path:
+    """
+    Like store_by_hash, but for a file on disk: hashed in chunks and copied with
+    fast_copy (reflink/copy_file_range where supported) instead of via Python bytes.
+    """
+    digest = _file_digest(src)
+    blob = store_dir / f"{digest}{ext}"
+    if not _blob_intact(blob, digest):
+        ensure_dir(store_dir)
+        tmp = blob.with_name(f"{blob.name}.{os.getpid()}.tmp")
+        tmp.unlink(missing_ok=True)
+        # Never hardlink the user's source: it may be edited in place after queuing
+        fast_copy(src, tmp, link=False)
+        os.replace(tmp, blob)
+    return blob
 
 def snapshot_source_to(dst_dir: Path, src_path: Path, tag: Optional[str]) -> Path:
     """
     Snapshot source file into dst_dir.
     - If .py and tag provided, filename becomes <stem>_<tag>.py
     - If .ipynb, clear outputs before saving; if tag provided, append to stem.
+    Identical content is stored once under dst_dir/.by-hash and hardlinked to the snapshot name
+    (run directories get their own copies; see prepare_run).
     Returns absolute snapshot path.
     """
     ensure_dir(dst_dir)
@@ -94,11 +554,22 @@ def snapshot_source_to(dst_dir: Path, src_path: Path, tag: Optional[str]) -> Pat
     stem = src_path.stem
     tag_s = sanitize_tag(tag)
     new_name = f"{stem}_{tag_s}{ext}" if tag_s else f"{stem}{ext}"
-    dst_path = (dst_dir / new_name).resolve()
+    dst_path = Path(os.path.abspath(dst_dir / new_name))
+    store_dir = dst_dir / HASH_STORE_DIRNAME
     if ext == ".ipynb":
-        copy_and_clear_ipynb(src_path, dst_path)
+        blob = store_by_hash(store_dir, cleared_ipynb_bytes(src_path), ext)
     else:
-        shutil.copy2(src_path, dst_path)
+        blob = store_file_by_hash(store_dir, src_path, ext)
+    # Link under a per-process name, then rename over the snapshot name: never writes into an
+    # inode the old name may share with a blob, and the queued path never goes missing
+    tmp = dst_path.with_name(f"{dst_path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        fast_copy(blob, tmp)
+        os.replace(tmp, dst_path)
+    finally:
+        # rename() is a no-op when both names are already links to the same blob
+        tmp.unlink(missing_ok=True)
     return dst_path
 
 def parse_iso(ts: str) -> datetime:
@@ -114,23 +585,23 @@ def human_duration(seconds: float) -> str:
     Render a compact human duration like '1h 02m 03s' or '5m 10s' or '12s'.
     """
     seconds = max(0, int(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        m, s = divmod(seconds, 60)
+        return f"{m}m {s:02d}s"
     h, rem = divmod(seconds, 3600)
     m, s = divmod(rem, 60)
-    parts = []
-    if h:
-        parts.append(f"{h}h")
-    if h or m:
-        parts.append(f"{m:02d}m" if h else f"{m}m")
-    parts.append(f"{s:02d}s" if (h or m) else f"{s}s")
-    return " ".join(parts)
+    return f"{h}h {m:02d}m {s:02d}s"
 
-def elapsed_since(ts_iso: str) -> str:
+def elapsed_since(ts_iso: str, now: Optional[datetime] = None) -> str:
     """
     Compute human duration from given ISO time until now (UTC).
+    Pass `now` to share one clock reading across many rows.
     """
     try:
         dt = parse_iso(ts_iso)
-        now = datetime.now(timezone.utc)
+        now = now or datetime.now(_UTC)
         return human_duration((now - dt).total_seconds())
     except Exception:
         return "?"
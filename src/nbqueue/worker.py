@@ -1,22 +1,93 @@
 from __future__ import annotations
 
 import os
+import select
 import signal
-import time
+import threading
 from pathlib import Path
 from typing import Optional
 
 from .exec import launch_papermill, prepare_run, update_latest_symlink, write_status_json
-from .ps import acquire_lock, kill_with_grace, release_lock
-from .state import State, get_or_create_session, load_state, save_state
-from .utils import iso_now
+from .ps import STOP_SIGNAL, acquire_lock, kill_with_grace, release_lock
+from .state import Session, State, StateTransaction, append_history, get_or_create_session
+from .utils import iso_now, read_json
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags  # type: ignore
+except ImportError:  # pragma: no cover
+    INotify = None  # Optional (Linux): idle workers fall back to sleeping poll_interval
 
 DEFAULT_KERNEL = os.environ.get("NBQ_DEFAULT_KERNEL", "python3")
 
+
+class _QueueWatcher:
+    """
+    Blocking wait used by the worker loop. Returns when a signal arrives (self-pipe from
+    signal.set_wakeup_fd), when state.json/queue.log in the session root change (inotify,
+    if available), or after the timeout.
+    """
+
+    def __init__(self, root: Path, stop_event: threading.Event, wake_fd: Optional[int]):
+        self._stop_event = stop_event
+        self._wake_fd = wake_fd
+        self._inotify = None
+        if INotify is not None:
+            try:
+                ino = INotify()
+                # Atomic state saves land as MOVED_TO; journal appends as CLOSE_WRITE
+                ino.add_watch(str(root), inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO)
+                self._inotify = ino
+            except OSError:
+                self._inotify = None
+
+    def wait(self, timeout: float) -> None:
+        fds = [] if self._wake_fd is None else [self._wake_fd]
+        if self._inotify is not None:
+            fds.append(self._inotify.fileno())
+        if not fds:
+            # Wakes early when the stop signal arrives
+            self._stop_event.wait(timeout)
+            return
+        ready, _, _ = select.select(fds, [], [], timeout)
+        if self._wake_fd in ready:
+            _drain(self._wake_fd)
+        if self._inotify is not None and self._inotify.fileno() in ready:
+            self._inotify.read(timeout=0)
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+def _drain(fd: int) -> None:
+    try:
+        while os.read(fd, 512):
+            pass
+    except BlockingIOError:
+        pass
+
 def _pop_next_item(st: State) -> Optional[dict]:
+    # Pop and mark running in one step, so a single save publishes both
     if not st.queue:
         return None
-    return st.queue.pop(0)
+    item = st.queue.pop(0)
+    item["status"] = "running"
+    item["started_at"] = iso_now()
+    st.current = item
+    return item
+
+def _kill_requested(session: Session, pid: int) -> Optional[float]:
+    """
+    Grace period if kill/abort marked the run with this pid canceled in state.json, else None.
+    Reads state.json only: the current item never lives in the queue journal.
+    """
+    cur = read_json(session.state_path, default={}).get("current") or {}
+    if cur.get("pid") != pid or cur.get("status") != "canceled":
+        return None
+    try:
+        return float(cur.get("kill_grace", 5.0))
+    except (TypeError, ValueError):
+        return 5.0
 
 def _finalize_current_append_history(item: dict, error: Optional[str] = None) -> dict:
     item["ended_at"] = item.get("ended_at") or iso_now()
@@ -30,138 +101,179 @@ def run_worker(timeout: Optional[int] = None, watch: bool = False, once: bool =
     - timeout: per-cell execution timeout forwarded to papermill (None = no timeout)
     - watch: keep running and pick up newly added items
     - once: process a single item (if any) and exit
+    - poll_interval: idle re-check interval in watch mode (upper bound when inotify is available)
     Returns 0 on normal exit.
     """
     session = get_or_create_session()
 
-    # Install signal handlers so killing the worker stops children and clears the queue
-    def _handle_terminate(_signum, _frame):  # type: ignore[unused-argument]
-        try:
-            st = load_state(session)
-            cur = st.current or {}
-            pgid = cur.get("pgid")
-            pid = cur.get("pid")
-            if pgid is None and pid is not None:
-                try:
-                    pgid = os.getpgid(int(pid))
-                except (ProcessLookupError, PermissionError, OSError):
-                    pgid = None
-            if pgid is not None:
-                try:
-                    kill_with_grace(int(pgid), grace_seconds=2.0)
-                except OSError:
-                    pass
-                # Mark as canceled and finalize best-effort
-                cur["status"] = "canceled"
-                cur["error"] = cur.get("error") or "worker terminated"
-                cur["ended_at"] = iso_now()
-                st.current = cur
-                try:
-                    run_dir = Path(cur["run_dir"]) if cur.get("run_dir") else None
-                    if run_dir:
-                        write_status_json(run_dir, success=False, returncode=-1, error=cur["error"])
-                except OSError:
-                    pass
-            # Empty the queue regardless
-            st.queue = []
-            save_state(session, st)
-        finally:
-            release_lock(session)
-            os._exit(0)
-
-    signal.signal(signal.SIGTERM, _handle_terminate)
-    signal.signal(signal.SIGINT, _handle_terminate)
+    # Signal handlers only set flags; all kill/state/status work happens on the main loop.
+    # set_wakeup_fd writes to a self-pipe on every signal so blocking waits return promptly.
+    terminate_event = threading.Event()
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda _signum, _frame: terminate_event.set())
+    signal.signal(signal.SIGINT, lambda _signum, _frame: terminate_event.set())
+    # `nbq cancel` signals us directly so we need not wait for the next state.json read
+    if STOP_SIGNAL is not None:
+        signal.signal(STOP_SIGNAL, lambda _signum, _frame: stop_event.set())
+    # A (no-op) Python handler makes child exit poke the wakeup fd too
+    if hasattr(signal, "SIGCHLD"):
+        signal.signal(signal.SIGCHLD, lambda _signum, _frame: None)
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    os.set_blocking(wake_w, False)
+    try:
+        prev_wakeup_fd = signal.set_wakeup_fd(wake_w)
+    except ValueError:  # pragma: no cover - not on the main thread
+        prev_wakeup_fd = None
+        os.close(wake_r)
+        os.close(wake_w)
+        wake_r = wake_w = -1
 
     if not acquire_lock(session):
         # Another worker is active; exit gracefully
+        _close_wakeup(prev_wakeup_fd, wake_r, wake_w)
         return 0
 
+    watcher = _QueueWatcher(session.root, stop_event, wake_r if wake_r >= 0 else None)
     exit_requested = False
     try:
         while not exit_requested:
-            st = load_state(session)
-
-            if st.stop_requested:
-                # Graceful stop requested
-                break
+            # One in-memory state per iteration; written only where observers need it
+            with StateTransaction(session) as txn:
+                st = txn.state
 
-            item = _pop_next_item(st)
-            if item is None:
-                save_state(session, st)
-                if once:
+                if terminate_event.is_set():
+                    # Killing the worker empties the queue (saved as the transaction exits)
+                    st.queue = []
                     break
-                if not watch:
+
+                if st.stop_requested or stop_event.is_set():
+                    # Graceful stop requested
                     break
-                time.sleep(poll_interval)
-                continue
 
-            # Start processing this item
-            item["status"] = "running"
-            item["started_at"] = iso_now()
+                item = _pop_next_item(st)
+                if item is None:
+                    if once or not watch:
+                        break
+                    # poll_interval stays as the fallback timeout when inotify is available
+                    watcher.wait(poll_interval)
+                    continue
 
-            try:
-                # Create a new run directly under the session root
-                run = prepare_run(Path(item["queue_path"]), session.root)
-                item["run_dir"] = str(run.run_dir)
-                st.current = item
-                save_state(session, st)
-
-                proc = launch_papermill(
-                    input_ipynb=run.input_ipynb,
-                    executed_ipynb=run.executed_ipynb,
-                    kernel=DEFAULT_KERNEL,
-                    timeout=timeout,
-                    log_path=run.log_path,
-                )
-                item["pid"] = proc.pid
+                # published: state flushed before the wait; refreshed: reloaded after it
+                published = refreshed = False
+                run_dir: Optional[Path] = None
                 try:
-                    item["pgid"] = os.getpgid(proc.pid)
-                except (ProcessLookupError, PermissionError, OSError):
-                    item["pgid"] = None
-
-                st.current = item
-                save_state(session, st)
-
-                returncode = proc.wait()
-                # Reload state to check if a kill/abort marked it canceled
-                st_after = load_state(session)
-                canceled_by_user = bool(st_after.current and st_after.current.get("status") == "canceled")
-
-                status_val = "canceled" if canceled_by_user else ("done" if returncode == 0 else "failed")
-                item["status"] = status_val
-                item["success"] = (returncode == 0) and not canceled_by_user
-                item["returncode"] = int(returncode)
-                item["ended_at"] = iso_now()
-                if canceled_by_user:
-                    item["error"] = item.get("error") or "killed by user"
-
-                write_status_json(run.run_dir, success=bool(item["success"]), returncode=int(returncode), error=item.get("error"))
-                update_latest_symlink(session.root, run.run_dir)
-
-            except (OSError, RuntimeError, ValueError) as e:
-                # Failure before or during launch; best-effort metadata
-                item["status"] = "failed"
-                item["success"] = False
-                item["returncode"] = -1
-                item["error"] = str(e)
-                item["ended_at"] = iso_now()
-                try:
-                    # Try to write status.json in run_dir if available
-                    run_dir = Path(item["run_dir"]) if item.get("run_dir") else None
-                    if run_dir:
-                        write_status_json(run_dir, success=False, returncode=-1, error=str(e))
-                except OSError:
-                    pass
-            finally:
-                # Append to history and clear current
-                st_final = load_state(session)
-                st_final.history.append(_finalize_current_append_history(item))
-                st_final.current = None
-                save_state(session, st_final)
-
-                if once:
-                    exit_requested = True
+                    # Create a new run directly under the session root
+                    run = prepare_run(Path(item["queue_path"]), session.root)
+                    run_dir = run.run_dir
+                    item["run_dir"] = str(run_dir)
+
+                    proc, pgid = launch_papermill(
+                        input_ipynb=run.input_ipynb,
+                        executed_ipynb=run.executed_ipynb,
+                        kernel=DEFAULT_KERNEL,
+                        timeout=timeout,
+                        log_path=run.log_path,
+                    )
+                    item["pid"] = proc.pid
+                    item["pgid"] = pgid
+
+                    # Publish the pop + running item + pid/pgid before blocking, so kill/abort can act
+                    txn.flush()
+                    published = True
+
+                    terminated = False
+                    while True:
+                        returncode = proc.poll()
+                        if returncode is not None:
+                            break
+                        if terminate_event.is_set():
+                            # Worker asked to die: take the notebook's process group down first
+                            kill_with_grace(pgid, grace_seconds=2.0, proc=proc)
+                            returncode = proc.wait()
+                            terminated = True
+                            break
+                        # Wakes on SIGCHLD/signals and, with inotify, on state saves by kill/abort
+                        watcher.wait(poll_interval)
+                        grace = _kill_requested(session, proc.pid)
+                        if grace is not None:
+                            # Marked canceled by the CLI: as the parent we can signal and reap promptly
+                            kill_with_grace(pgid, grace_seconds=grace, proc=proc)
+                            returncode = proc.wait()
+                            break
+
+                    # Reload once: check whether kill/abort marked it canceled, and finalize on this copy
+                    st_after = txn.reload()
+                    refreshed = True
+                    cur_after = st_after.current or {}
+                    # pid guard: a kill that raced with the previous run's finish must not cancel this one
+                    canceled_by_user = cur_after.get("pid") == proc.pid and cur_after.get("status") == "canceled"
+                    canceled = terminated or canceled_by_user
+
+                    status_val = "canceled" if canceled else ("done" if returncode == 0 else "failed")
+                    item["status"] = status_val
+                    item["success"] = (returncode == 0) and not canceled
+                    item["returncode"] = int(returncode)
+                    item["ended_at"] = iso_now()
+                    if terminated:
+                        item["error"] = item.get("error") or "worker terminated"
+                    elif canceled_by_user:
+                        item["error"] = item.get("error") or "killed by user"
+
+                    write_status_json(
+                        run_dir,
+                        success=bool(item["success"]),
+                        returncode=int(returncode),
+                        error=item.get("error"),
+                        started_at=item["started_at"],
+                        ended_at=item["ended_at"],
+                    )
+                    update_latest_symlink(session.root, run_dir)
+
+                except (OSError, RuntimeError, ValueError) as e:
+                    # Failure before or during launch; best-effort metadata
+                    item["status"] = "failed"
+                    item["success"] = False
+                    item["returncode"] = -1
+                    item["error"] = str(e)
+                    item["ended_at"] = iso_now()
+                    try:
+                        # Try to write status.json in run_dir if available
+                        if run_dir is not None:
+                            write_status_json(
+                                run_dir,
+                                success=False,
+                                returncode=-1,
+                                error=str(e),
+                                started_at=item["started_at"],
+                                ended_at=item["ended_at"],
+                            )
+                    except OSError:
+                        pass
+                finally:
+                    # Append to history.jsonl first so the item is always visible somewhere, then
+                    # clear current; saved (with the pop, if never published) as the transaction exits
+                    append_history(session, _finalize_current_append_history(item))
+                    if published and not refreshed:
+                        # Errored mid-wait: don't overwrite what the CLI wrote meanwhile
+                        txn.reload()
+                    st_final = txn.state
+                    st_final.current = None
+                    if terminate_event.is_set():
+                        st_final.queue = []
+
+                    if once or terminate_event.is_set():
+                        exit_requested = True
 
     finally:
+        watcher.close()
         release_lock(session)
+        _close_wakeup(prev_wakeup_fd, wake_r, wake_w)
     return 0
+
+def _close_wakeup(prev_wakeup_fd: Optional[int], wake_r: int, wake_w: int) -> None:
+    if prev_wakeup_fd is not None:
+        signal.set_wakeup_fd(prev_wakeup_fd)
+    for fd in (wake_r, wake_w):
+        if fd >= 0:
+            os.close(fd)